@@ -1,74 +1,64 @@
+import numpy as np
 import pandas as pd
 import geopandas as gpd
-import json
+import orjson
+
+gpd.options.io_engine = "pyogrio"
 
 print("Creating complete county dataset with ALL counties...")
 
 # Read the shapefile to get ALL valid US counties
 print("\n1. Loading county boundaries from shapefile...")
-gdf = gpd.read_file('data/tl_2025_us_county.shp')
+# Only GEOID is needed, so skip decoding the geometries
+gdf = gpd.read_file('data/tl_2025_us_county.shp', engine='pyogrio', use_arrow=True,
+                    columns=['GEOID'], ignore_geometry=True)
 all_fips = set(gdf['GEOID'].astype(str).str.zfill(5).unique())
 print(f"   Counties in shapefile: {len(all_fips)}")
 
 # Read existing merged data
 print("\n2. Loading existing merged data...")
 df = pd.read_csv('county_year_merged.csv')
+df['fips'] = df['fips'].astype(str).str.zfill(5)  # match shapefile GEOIDs
 data_fips = set(df['fips'].unique())
 print(f"   Counties in data: {len(data_fips)}")
 
-# Find differences
-in_shapefile_not_data = all_fips - data_fips
-in_data_not_shapefile = data_fips - all_fips
+# Find differences with vectorized membership tests on sorted arrays
+all_fips_arr = np.array(sorted(all_fips))
+data_fips_arr = np.array(sorted(data_fips))
+in_shapefile_not_data = all_fips_arr[~np.isin(all_fips_arr, data_fips_arr)]
+in_data_not_shapefile = data_fips_arr[~np.isin(data_fips_arr, all_fips_arr)]
 
 print(f"\n3. Analysis:")
 print(f"   Counties in shapefile but not in data: {len(in_shapefile_not_data)}")
 if len(in_shapefile_not_data) > 0:
-    print(f"      Examples: {list(in_shapefile_not_data)[:5]}")
+    print(f"      Examples: {in_shapefile_not_data[:5].tolist()}")
 print(f"   Counties in data but not in shapefile: {len(in_data_not_shapefile)}")
 if len(in_data_not_shapefile) > 0:
-    print(f"      Examples: {list(in_data_not_shapefile)[:5]}")
+    print(f"      Examples: {in_data_not_shapefile[:5].tolist()}")
 
 # Create complete dataset with ALL counties from shapefile
 print("\n4. Creating complete dataset...")
 years = [2018, 2019, 2020, 2021, 2022, 2023]
-complete_rows = []
-
-for fips in sorted(all_fips):
-    for year in years:
-        # Check if this county-year exists in data
-        existing = df[(df['fips'] == fips) & (df['Year'] == year)]
-
-        if len(existing) > 0:
-            # Use existing data
-            row = existing.iloc[0].to_dict()
-        else:
-            # Create row with NA values
-            row = {
-                'fips': fips,
-                'Year': year,
-                'PerCapitaIncome': None,
-                'UnemploymentRate': None,
-                'PovertyRate': None,
-                'MedianIncome': None,
-                'Rent': None,
-                'BachelorsOrHigher': None,
-                'WhiteAlone': None,
-                'BlackAlone': None,
-                'HispanicLatino': None,
-                'Population': None,
-                'RepublicanVoteShare': None,
-                'DemocratVoteShare': None,
-                'RepublicanMargin': None,
-                'DrugDeaths': None,
-                'DrugDeathRate': None,
-                'SuicideDeaths': None,
-                'SuicideRate': None,
-                'MentalHealthScore': None
-            }
-
-        complete_rows.append(row)
-
-complete_df = pd.DataFrame(complete_rows)
+
+# Preallocate every expected value column (as NaN) so the grid has a fixed
+# schema even when the merged data lacks some of them
+schema_cols = [
+    'PerCapitaIncome', 'UnemploymentRate', 'PovertyRate', 'MedianIncome', 'Rent',
+    'BachelorsOrHigher', 'WhiteAlone', 'BlackAlone', 'HispanicLatino', 'Population',
+    'RepublicanVoteShare', 'DemocratVoteShare', 'RepublicanMargin', 'DrugDeaths',
+    'DrugDeathRate', 'SuicideDeaths', 'SuicideRate', 'MentalHealthScore'
+]
+df = df.reindex(columns=df.columns.union(schema_cols, sort=False))
+
+# Align every shapefile county with every year in one indexed join;
+# county-years missing from the data come back as NA rows
+full_index = pd.MultiIndex.from_product([all_fips_arr, years], names=['fips', 'Year'])
+complete_df = (
+    df.drop_duplicates(subset=['fips', 'Year'])
+    .set_index(['fips', 'Year'])
+    .reindex(full_index)
+    .reset_index()
+)
 
 print(f"\n5. Complete dataset created:")
 print(f"   Total rows: {len(complete_df)}")
@@ -92,27 +82,21 @@ print(f"\n✓ Saved: county_year_merged_complete.csv")
 print(f"\n7. Creating yearly JSON files...")
 yearly_data = {}
 
-for year in years:
-    year_df = complete_df[complete_df['Year'] == year].copy()
-
-    counties = []
-    for _, row in year_df.iterrows():
-        county = {
-            'fips': row['fips'],
-            'DrugDeathRate': float(row['DrugDeathRate']) if pd.notna(row['DrugDeathRate']) else None,
-            'SuicideRate': float(row['SuicideRate']) if pd.notna(row['SuicideRate']) else None,
-            'RepublicanMargin': float(row['RepublicanMargin']) if pd.notna(row['RepublicanMargin']) else None,
-            'UnemploymentRate': float(row['UnemploymentRate']) if pd.notna(row['UnemploymentRate']) else None,
-            'PovertyRate': float(row['PovertyRate']) if pd.notna(row['PovertyRate']) else None,
-        }
-        counties.append(county)
+# Cast the exported columns once; object dtype so missing values become
+# None (JSON null) rather than NaN
+value_cols = ['DrugDeathRate', 'SuicideRate', 'RepublicanMargin', 'UnemploymentRate', 'PovertyRate']
+json_cols = ['fips'] + value_cols
+json_df = complete_df[['Year'] + json_cols].astype({col: 'float64' for col in value_cols})
+json_df[value_cols] = json_df[value_cols].astype(object).where(json_df[value_cols].notna(), None)
 
-    yearly_data[str(year)] = counties
-    print(f"   Year {year}: {len(counties)} counties")
+for year, year_df in json_df.groupby('Year', sort=False):
+    # Columnar payload: one header, then one value list per county
+    yearly_data[str(year)] = {'columns': json_cols, 'rows': year_df[json_cols].values.tolist()}
+    print(f"   Year {year}: {len(year_df)} counties")
 
 # Save yearly data
-with open('public/data/yearly_county_data_complete.json', 'w') as f:
-    json.dump(yearly_data, f)
+with open('public/data/yearly_county_data_complete.json', 'wb') as f:
+    f.write(orjson.dumps(yearly_data, option=orjson.OPT_SERIALIZE_NUMPY))
 
 print(f"\n✓ Saved: public/data/yearly_county_data_complete.json")
 print(f"\n✓ Complete! All {len(all_fips)} counties from shapefile are now included.")
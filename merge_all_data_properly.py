@@ -1,6 +1,8 @@
 import pandas as pd
 import geopandas as gpd
-import json
+import orjson
+
+gpd.options.io_engine = "pyogrio"
 
 print("=" * 80)
 print("COMPREHENSIVE DATA MERGE - Including All Drug Deaths Data")
@@ -8,7 +10,9 @@ print("=" * 80)
 
 # Step 1: Load shapefile to get all valid counties
 print("\n1. Loading county boundaries...")
-gdf = gpd.read_file('data/tl_2025_us_county.shp')
+# Only GEOID is needed, so skip decoding the geometries
+gdf = gpd.read_file('data/tl_2025_us_county.shp', engine='pyogrio', use_arrow=True,
+                    columns=['GEOID'], ignore_geometry=True)
 all_fips = set(gdf['GEOID'].astype(str).str.zfill(5).unique())
 print(f"   ✓ {len(all_fips)} counties in shapefile")
 
@@ -24,37 +28,16 @@ drug_df = drug_df[drug_df['Year'].notna()]  # Remove NaN years
 drug_df['Year'] = drug_df['Year'].astype(int).astype(str)
 
 # Handle Deaths column - convert Suppressed to 0, keep numeric values
-def parse_deaths(val):
-    if pd.isna(val):
-        return None, False
-    if isinstance(val, str):
-        if val.lower() == 'suppressed':
-            return 0, True  # 0 deaths, is_suppressed=True
-        try:
-            return float(val), False
-        except:
-            return None, False
-    return float(val), False
-
-drug_df[['Deaths_Value', 'Is_Suppressed']] = drug_df['Deaths'].apply(
-    lambda x: pd.Series(parse_deaths(x))
+deaths_lower = drug_df['Deaths'].astype(str).str.lower()
+drug_df['Is_Suppressed'] = deaths_lower.eq('suppressed')
+drug_df['Deaths_Value'] = pd.to_numeric(drug_df['Deaths'], errors='coerce').mask(drug_df['Is_Suppressed'], 0)
+
+# Handle Crude Rate similarly - Suppressed/Unreliable become missing
+rate_lower = drug_df['Crude Rate'].astype(str).str.lower()
+drug_df['Crude_Rate_Value'] = pd.to_numeric(
+    drug_df['Crude Rate'].mask(rate_lower.isin(['suppressed', 'unreliable'])), errors='coerce'
 )
 
-# Handle Crude Rate similarly
-def parse_rate(val):
-    if pd.isna(val):
-        return None
-    if isinstance(val, str):
-        if val.lower() in ['suppressed', 'unreliable']:
-            return None
-        try:
-            return float(val)
-        except:
-            return None
-    return float(val)
-
-drug_df['Crude_Rate_Value'] = drug_df['Crude Rate'].apply(parse_rate)
-
 print(f"   ✓ Parsed deaths: {drug_df['Deaths_Value'].notna().sum()} valid values")
 print(f"   ✓ Suppressed records: {drug_df['Is_Suppressed'].sum()}")
 
@@ -67,57 +50,43 @@ print(f"   ✓ Existing merged data: {len(existing_df)} rows")
 # Step 4: Create complete dataset
 print("\n4. Creating complete dataset with all counties and years...")
 years = ['2018', '2019', '2020', '2021', '2022', '2023']
-complete_rows = []
-
-for fips in sorted(all_fips):
-    for year in years:
-        # Get drug death data
-        drug_record = drug_df[
-            (drug_df['County Code'] == fips) &
-            (drug_df['Year'] == year)
-        ]
-
-        # Get other data
-        existing_record = existing_df[
-            (existing_df['fips'] == fips) &
-            (existing_df['Year'] == int(year))
-        ]
-
-        # Build row
-        row = {
-            'fips': fips,
-            'Year': year,
-        }
-
-        # Add drug death information
-        if len(drug_record) > 0:
-            rec = drug_record.iloc[0]
-            row['DrugDeaths'] = rec['Deaths_Value']
-            row['DrugDeathRate'] = rec['Crude_Rate_Value']
-            row['Is_Suppressed'] = rec['Is_Suppressed']
-        else:
-            row['DrugDeaths'] = None
-            row['DrugDeathRate'] = None
-            row['Is_Suppressed'] = False
-
-        # Add other data
-        if len(existing_record) > 0:
-            rec = existing_record.iloc[0]
-            for col in ['UnemploymentRate', 'PovertyRate', 'MedianIncome', 'RepublicanMargin',
-                       'SuicideDeaths', 'SuicideRate', 'Population']:
-                row[col] = rec[col] if col in rec else None
-        else:
-            row['UnemploymentRate'] = None
-            row['PovertyRate'] = None
-            row['MedianIncome'] = None
-            row['RepublicanMargin'] = None
-            row['SuicideDeaths'] = None
-            row['SuicideRate'] = None
-            row['Population'] = None
-
-        complete_rows.append(row)
-
-complete_df = pd.DataFrame(complete_rows)
+
+# Keep only rows on the county-year grid and use categorical keys with
+# shared categories, so the joins below compare integer codes rather
+# than hashing strings
+fips_dtype = pd.CategoricalDtype(categories=sorted(all_fips))
+year_dtype = pd.CategoricalDtype(categories=years)
+drug_df = drug_df[drug_df['County Code'].isin(all_fips) & drug_df['Year'].isin(years)]
+drug_df = drug_df.astype({'County Code': fips_dtype, 'Year': year_dtype})
+existing_df['Year'] = existing_df['Year'].astype('Int64').astype(str)
+existing_df = existing_df[existing_df['fips'].isin(all_fips) & existing_df['Year'].isin(years)]
+existing_df = existing_df.astype({'fips': fips_dtype, 'Year': year_dtype})
+
+full_index = pd.MultiIndex.from_product(
+    [pd.Categorical(sorted(all_fips), dtype=fips_dtype), pd.Categorical(years, dtype=year_dtype)],
+    names=['fips', 'Year']
+)
+
+# Drug death information, aligned to every county-year (first record wins)
+drug_cols = {'Deaths_Value': 'DrugDeaths', 'Crude_Rate_Value': 'DrugDeathRate', 'Is_Suppressed': 'Is_Suppressed'}
+drug_part = (
+    drug_df.drop_duplicates(subset=['County Code', 'Year'])
+    .set_index(['County Code', 'Year'])[list(drug_cols)]
+    .rename(columns=drug_cols)
+    .reindex(full_index)
+)
+drug_part['Is_Suppressed'] = drug_part['Is_Suppressed'].eq(True)  # missing records -> False
+
+# Other data, keyed the same way
+existing_cols = ['UnemploymentRate', 'PovertyRate', 'MedianIncome', 'RepublicanMargin',
+                 'SuicideDeaths', 'SuicideRate', 'Population']
+existing_part = (
+    existing_df.drop_duplicates(subset=['fips', 'Year'])
+    .set_index(['fips', 'Year'])
+    .reindex(index=full_index, columns=existing_cols)
+)
+
+complete_df = pd.concat([drug_part, existing_part], axis=1).reset_index()
 
 print(f"\n5. Complete dataset created:")
 print(f"   ✓ Total rows: {len(complete_df)}")
@@ -145,33 +114,29 @@ print(f"\n✓ Saved: county_year_complete_with_suppressed.csv")
 print(f"\n7. Creating yearly JSON files for visualization...")
 yearly_data = {}
 
-for year in years:
-    year_df = complete_df[complete_df['Year'] == year].copy()
-
-    counties = []
-    for _, row in year_df.iterrows():
-        county = {
-            'fips': row['fips'],
-            'DrugDeaths': float(row['DrugDeaths']) if pd.notna(row['DrugDeaths']) else None,
-            'DrugDeathRate': float(row['DrugDeathRate']) if pd.notna(row['DrugDeathRate']) else None,
-            'Is_Suppressed': bool(row['Is_Suppressed']),
-            'SuicideRate': float(row['SuicideRate']) if pd.notna(row['SuicideRate']) else None,
-            'RepublicanMargin': float(row['RepublicanMargin']) if pd.notna(row['RepublicanMargin']) else None,
-            'UnemploymentRate': float(row['UnemploymentRate']) if pd.notna(row['UnemploymentRate']) else None,
-            'PovertyRate': float(row['PovertyRate']) if pd.notna(row['PovertyRate']) else None,
-        }
-        counties.append(county)
-
-    yearly_data[year] = counties
+# Cast the exported columns once; object dtype so missing values become
+# None (JSON null) rather than NaN
+value_cols = ['DrugDeaths', 'DrugDeathRate', 'SuicideRate', 'RepublicanMargin',
+              'UnemploymentRate', 'PovertyRate']
+json_cols = ['fips', 'DrugDeaths', 'DrugDeathRate', 'Is_Suppressed', 'SuicideRate',
+             'RepublicanMargin', 'UnemploymentRate', 'PovertyRate']
+json_df = complete_df[['Year'] + json_cols].astype(
+    {**{col: 'float64' for col in value_cols}, 'Is_Suppressed': 'bool'}
+)
+json_df[value_cols] = json_df[value_cols].astype(object).where(json_df[value_cols].notna(), None)
+
+for year, year_df in json_df.groupby('Year', sort=False, observed=True):
+    # Columnar payload: one header, then one value list per county
+    yearly_data[year] = {'columns': json_cols, 'rows': year_df[json_cols].values.tolist()}
 
     # Count statistics
-    with_data = sum(1 for c in counties if c['DrugDeaths'] is not None)
-    suppressed = sum(1 for c in counties if c['Is_Suppressed'])
-    print(f"   Year {year}: {len(counties)} counties, {with_data} with drug data, {suppressed} suppressed")
+    with_data = year_df['DrugDeaths'].notna().sum()
+    suppressed = year_df['Is_Suppressed'].sum()
+    print(f"   Year {year}: {len(year_df)} counties, {with_data} with drug data, {suppressed} suppressed")
 
 # Save yearly JSON
-with open('public/data/yearly_county_data_complete.json', 'w') as f:
-    json.dump(yearly_data, f)
+with open('public/data/yearly_county_data_complete.json', 'wb') as f:
+    f.write(orjson.dumps(yearly_data, option=orjson.OPT_SERIALIZE_NUMPY))
 
 print(f"\n✓ Saved: public/data/yearly_county_data_complete.json")
 print(f"\n" + "=" * 80)
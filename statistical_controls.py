@@ -4,18 +4,48 @@ Statistical Controls for County Comparison
 Implements regression-based adjustment for confounding variables
 """
 
+import functools
 import json
+from collections import Counter
 import numpy as np
-from scipy import stats
+from scipy import linalg, stats
 from typing import Dict, List, Optional, Tuple
 
-def load_year_data(year: int = 2023) -> List[Dict]:
-    """Load county data for a specific year"""
+@functools.lru_cache(maxsize=16)
+def load_year_data(year: int = 2023) -> Tuple[List[Dict], Dict[str, Dict]]:
+    """
+    Load county data for a specific year, plus a fips -> county lookup.
+
+    Results are cached and shared between callers, so treat them as read-only.
+    """
     import os
     base_path = os.path.dirname(os.path.abspath(__file__))
     file_path = os.path.join(base_path, 'public', 'data', 'years', f'{year}.json')
     with open(file_path, 'r') as f:
-        return json.load(f)
+        data = json.load(f)
+
+    # Some fips appear more than once; the first record wins
+    by_fips = {}
+    for c in data:
+        by_fips.setdefault(str(c['fips']), c)
+    return data, by_fips
+
+@functools.lru_cache(maxsize=16)
+def load_regression_counties(year: int = 2023) -> List[Dict]:
+    """Counties for a year that have a drug death rate (cached, read-only)"""
+    data, _ = load_year_data(year)
+    return [c for c in data if c.get('DrugDeathRate') is not None]
+
+def confounder_column(counties: List[Dict], conf: str) -> np.ndarray:
+    """Extract one confounder as a float column (NaN where missing)"""
+    if conf == 'urban_rural':
+        # Binary encoding: urban=1, rural=0
+        values = np.array([c.get(conf) for c in counties], dtype=object)
+        column = np.where(values == 'urban', 1.0, 0.0)
+        column[np.equal(values, None)] = np.nan
+        return column
+    # Continuous variable
+    return np.array([c.get(conf) for c in counties], dtype=float)
 
 def adjust_for_confounders(
     county_a_fips: str,
@@ -30,13 +60,10 @@ def adjust_for_confounders(
 
     Returns both raw and adjusted values for comparison.
     """
-    data = load_year_data(year)
+    _, by_fips = load_year_data(year)
 
-    # Convert to arrays for regression
-    counties = []
-    for c in data:
-        if c.get('DrugDeathRate') is not None:
-            counties.append(c)
+    # Counties usable for regression
+    counties = load_regression_counties(year)
 
     if len(counties) < 50:
         return {
@@ -45,8 +72,8 @@ def adjust_for_confounders(
         }
 
     # Find target counties
-    county_a = next((c for c in data if str(c['fips']) == str(county_a_fips)), None)
-    county_b = next((c for c in data if str(c['fips']) == str(county_b_fips)), None)
+    county_a = by_fips.get(str(county_a_fips))
+    county_b = by_fips.get(str(county_b_fips))
 
     if not county_a or not county_b:
         return {'error': 'County not found'}
@@ -62,6 +89,63 @@ def adjust_for_confounders(
     if control_urban_rural:
         confounder_fields.append('urban_rural')  # Will need to encode this
 
+    # If no controls selected, return raw values
+    if not confounder_fields:
+        results = {}
+        for outcome in outcome_fields:
+            raw_a = county_a.get(outcome)
+            raw_b = county_b.get(outcome)
+            missing = raw_a is None or raw_b is None
+            results[outcome] = {
+                'raw_a': raw_a,
+                'raw_b': raw_b,
+                'adjusted_a': None if missing else raw_a,
+                'adjusted_b': None if missing else raw_b,
+                'adjustment_note': 'Missing data' if missing else 'No controls applied'
+            }
+        return results
+
+    # Fill-in values for target counties missing a confounder:
+    # mode for categorical, mean for continuous variables
+    fill_values = {}
+    for conf in confounder_fields:
+        conf_values = [c.get(conf) for c in counties if c.get(conf) is not None]
+        if conf == 'urban_rural':
+            fill_values[conf] = Counter(conf_values).most_common(1)[0][0] if conf_values else 'rural'
+        else:
+            fill_values[conf] = np.mean(conf_values) if conf_values else 0
+
+    # The confounder design does not depend on the outcome, so build it once
+    X_conf = np.column_stack([confounder_column(counties, conf) for conf in confounder_fields])
+    conf_complete = ~np.isnan(X_conf).any(axis=1)
+
+    # Confounder values for counties A and B (with intercept),
+    # using the county value if available, otherwise the fill-in value
+    conf_a = []
+    conf_b = []
+    for conf in confounder_fields:
+        val_a = county_a.get(conf)
+        val_b = county_b.get(conf)
+        if val_a is None:
+            val_a = fill_values[conf]
+        if val_b is None:
+            val_b = fill_values[conf]
+
+        # Encode categorical variables
+        if conf == 'urban_rural':
+            # Binary encoding: urban=1, rural=0
+            conf_a.append(1 if val_a == 'urban' else 0)
+            conf_b.append(1 if val_b == 'urban' else 0)
+        else:
+            conf_a.append(val_a)
+            conf_b.append(val_b)
+
+    X_a = np.array([1] + conf_a)
+    X_b = np.array([1] + conf_b)
+
+    # Cholesky factors of X'X, shared by outcomes with the same sample
+    factors = {}
+
     results = {}
 
     # For each outcome, compute adjusted values
@@ -79,44 +163,11 @@ def adjust_for_confounders(
             }
             continue
 
-        # If no controls selected, return raw values
-        if not confounder_fields:
-            results[outcome] = {
-                'raw_a': raw_a,
-                'raw_b': raw_b,
-                'adjusted_a': raw_a,
-                'adjusted_b': raw_b,
-                'adjustment_note': 'No controls applied'
-            }
-            continue
-
-        # Build regression dataset
-        Y = []
-        X = []
-        for c in counties:
-            y_val = c.get(outcome)
-            if y_val is None:
-                continue
-
-            x_vals = []
-            skip = False
-            for conf in confounder_fields:
-                conf_val = c.get(conf)
-                if conf_val is None:
-                    skip = True
-                    break
-
-                # Encode categorical variables
-                if conf == 'urban_rural':
-                    # Binary encoding: urban=1, rural=0
-                    x_vals.append(1 if conf_val == 'urban' else 0)
-                else:
-                    # Continuous variable
-                    x_vals.append(conf_val)
-
-            if not skip:
-                Y.append(y_val)
-                X.append(x_vals)
+        # Build regression dataset, keeping counties with no missing values
+        y_arr = np.array([c.get(outcome) for c in counties], dtype=float)
+        valid = conf_complete & ~np.isnan(y_arr)
+        Y = y_arr[valid]
+        X = X_conf[valid]
 
         if len(Y) < 30:
             results[outcome] = {
@@ -128,54 +179,28 @@ def adjust_for_confounders(
             }
             continue
 
-        # Convert to numpy arrays
-        Y = np.array(Y)
-        X = np.array(X)
-
         # Add intercept
         X = np.column_stack([np.ones(len(X)), X])
 
         # Fit linear regression
         try:
-            # Use least squares: beta = (X'X)^-1 X'Y
-            beta = np.linalg.lstsq(X, Y, rcond=None)[0]
+            # Solve the normal equations X'X beta = X'Y via Cholesky (X'X is
+            # only (k+1)x(k+1)); fall back to SVD least squares if singular
+            key = valid.tobytes()
+            if key not in factors:
+                try:
+                    factors[key] = linalg.cho_factor(X.T @ X)
+                except np.linalg.LinAlgError:
+                    factors[key] = None
+            if factors[key] is not None:
+                beta = linalg.cho_solve(factors[key], X.T @ Y)
+            else:
+                beta = np.linalg.lstsq(X, Y, rcond=None)[0]
 
             # Compute residuals (adjusted values)
             # For county A and B, compute predicted value based on their confounders
             # Then adjusted value = raw - (predicted - mean(predicted))
 
-            # Get confounder values for counties A and B
-            conf_a = []
-            conf_b = []
-            for conf in confounder_fields:
-                val_a = county_a.get(conf)
-                val_b = county_b.get(conf)
-
-                # Encode categorical variables
-                if conf == 'urban_rural':
-                    # Calculate mode (most common) for categorical
-                    conf_values = [c.get(conf) for c in counties if c.get(conf) is not None]
-                    mode_val = max(set(conf_values), key=conf_values.count) if conf_values else 'rural'
-
-                    # Binary encoding: urban=1, rural=0
-                    val_a_encoded = 1 if (val_a if val_a is not None else mode_val) == 'urban' else 0
-                    val_b_encoded = 1 if (val_b if val_b is not None else mode_val) == 'urban' else 0
-
-                    conf_a.append(val_a_encoded)
-                    conf_b.append(val_b_encoded)
-                else:
-                    # Calculate mean for continuous variables
-                    conf_values = [c.get(conf) for c in counties if c.get(conf) is not None]
-                    mean_val = np.mean(conf_values) if conf_values else 0
-
-                    # Use county value if available, otherwise use mean
-                    conf_a.append(val_a if val_a is not None else mean_val)
-                    conf_b.append(val_b if val_b is not None else mean_val)
-
-            # Add intercept
-            X_a = np.array([1] + conf_a)
-            X_b = np.array([1] + conf_b)
-
             # Predicted values
             pred_a = np.dot(X_a, beta)
             pred_b = np.dot(X_b, beta)
@@ -218,8 +243,12 @@ def adjust_for_confounders(
 
 
 if __name__ == '__main__':
+    # Duplicated fips must resolve to their first record (01001 appears twice in 2021)
+    data_2021, by_fips_2021 = load_year_data(2021)
+    assert by_fips_2021['01001'] is next(c for c in data_2021 if str(c['fips']) == '01001')
+
     # Test with example counties - first find some valid FIPS codes
-    data = load_year_data(2023)
+    data, _ = load_year_data(2023)
 
     # Find two DIFFERENT counties with complete data
     test_counties = []